@@ -4,13 +4,19 @@ Comprehensive Voice Assistant Pipeline Test
 Tests all components of the voice assistant system
 """
 
-import requests
+import argparse
+import contextvars
+import threading
 import time
 import subprocess
-import json
+import math
 import sys
 import os
-from pathlib import Path
+
+# asyncio, concurrent.futures, http.client, json, orjson, pathlib, random,
+# shutil, aiohttp and pydbus are imported where they are used so that
+# --help, argument errors and other early exits do not pay for their import
+# chains. threading comes with subprocess anyway.
 
 # Colors for output
 RED = '\033[0;31m'
@@ -19,51 +25,470 @@ YELLOW = '\033[1;33m'
 BLUE = '\033[0;34m'
 NC = '\033[0m'  # No Color
 
+def env_seconds(name, default):
+    """Read a positive, finite number of seconds from the environment"""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = None
+    if seconds is None or not (seconds > 0 and math.isfinite(seconds)):
+        # A zero timeout would make the sockets non-blocking, so anything
+        # that is not a positive number falls back to the default
+        print(f"{YELLOW}⚠ Ignoring {name}={value!r}, expected a finite, positive number of seconds; "
+              f"using {default:g}{NC}", file=sys.stderr)
+        return default
+    return seconds
+
+# HTTP probe timeouts in seconds, overridable so CI can tune them
+CONNECT_TIMEOUT = env_seconds("VOICE_TEST_CONNECT_TIMEOUT", 1.0)
+READ_TIMEOUT = env_seconds("VOICE_TEST_READ_TIMEOUT", 2.0)
+
+# Failures to connect are retried this many times in total, with
+# exponential backoff (seconds) plus jitter between attempts. Read timeouts
+# are not retried.
+PROBE_ATTEMPTS = 3
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 1.0
+
+# Longest a single probe can take: every connect attempt times out with the
+# longest backoff in between, then the last attempt waits out the read
+PROBE_WORST_CASE = (
+    PROBE_ATTEMPTS * CONNECT_TIMEOUT + READ_TIMEOUT
+    + sum(min(BACKOFF_CAP, BACKOFF_BASE * 2 ** i) + BACKOFF_BASE for i in range(PROBE_ATTEMPTS - 1))
+)
+
+# Idle keep-alive connections to local services, keyed by port
+IDLE_CONNECTIONS = {}
+POOL_LOCK = threading.Lock()
+
+# Wyoming services as (display name, port, systemd unit)
+WYOMING_SERVICES = [
+    ("Wyoming Whisper", 10300, "wyoming-whisper.service"),
+    ("Wyoming Piper", 10200, "wyoming-piper.service"),
+    ("Wyoming OpenWakeWord", 10400, "wyoming-openwakeword.service"),
+]
+
+# HTTP endpoints and systemd units probed concurrently before the tests run
+HTTP_TARGETS = [
+    ("Ollama", 11434, "/api/version"),
+    *((name, port, "/info") for name, port, _ in WYOMING_SERVICES),
+    ("Home Assistant", 8123, "/"),
+]
+SYSTEMD_UNITS = [
+    "ollama.service",
+    *(unit for _, _, unit in WYOMING_SERVICES),
+    "home-assistant@homeassistant.service",
+]
+
+# Internet reachability probe as (host, endpoint), also its HTTP_RESULTS key
+INTERNET_PROBE = ("httpbin.org", "/get")
+
+# Probe results for the current run, keyed by (port, endpoint) and unit name.
+# Filled by run_all_probes() and on demand, so no service is checked twice.
+HTTP_RESULTS = {}
+SYSTEMD_RESULTS = {}
+
+# Bumped by clear_caches(), so a probe thread abandoned by an earlier round
+# cannot store its late result in the current round's caches
+CACHE_ROUND = 0
+
+# Absolute paths of the programs we launch, resolved on first use
+PROGRAM_PATHS = {}
+
+# Status line templates, keyed by status
+STATUS_FORMATS = {
+    "SUCCESS": f"{GREEN}✓ {{}}{NC}",
+    "ERROR": f"{RED}✗ {{}}{NC}",
+    "WARNING": f"{YELLOW}⚠ {{}}{NC}",
+    "INFO": f"{BLUE}ℹ {{}}{NC}",
+}
+
+# Print as we go on a terminal; otherwise (pipes, journald, CI logs) collect
+# the output and write it in one go with flush_output(). With --json the
+# human-readable output moves to stderr so stdout only carries the report.
+OUTPUT = sys.stdout
+INTERACTIVE = OUTPUT.isatty()
+_OUT_BUF = []
+
+# Seconds each voice pipeline component may take before it counts as failed,
+# derived from the probe settings so a slow probe cannot exceed it
+COMPONENT_TIMEOUT = PROBE_WORST_CASE + 2
+
+# Output collected by a component test running concurrently with the others,
+# so it can be printed in order afterwards. None means print immediately.
+STATUS_BUFFER = contextvars.ContextVar("STATUS_BUFFER", default=None)
+
+# CPU temperature sysfs file and its descriptor, kept open once read
+THERMAL_ZONE = "/sys/class/thermal/thermal_zone0/temp"
+THERMAL_FD = None
+
+# orjson module, imported on first use. False once it turned out to be missing.
+ORJSON = None
+
+# systemd D-Bus proxies, created on first use and reused afterwards.
+# SYSTEMD_MANAGER is False once D-Bus turned out to be unavailable.
+SYSTEM_BUS = None
+SYSTEMD_MANAGER = None
+
+def emit(line):
+    """Print a line, or hold it back if the output is being buffered"""
+    buffer = STATUS_BUFFER.get()
+    if buffer is not None:
+        buffer.append(line)
+    elif INTERACTIVE:
+        print(line, file=OUTPUT)
+    else:
+        _OUT_BUF.append(f"{line}\n")
+
+def flush_output():
+    """Write all buffered output with a single write"""
+    if _OUT_BUF:
+        OUTPUT.write("".join(_OUT_BUF))
+        OUTPUT.flush()
+        _OUT_BUF.clear()
+
 def print_status(message, status="INFO"):
     """Print colored status message"""
-    if status == "SUCCESS":
-        print(f"{GREEN}✓ {message}{NC}")
-    elif status == "ERROR":
-        print(f"{RED}✗ {message}{NC}")
-    elif status == "WARNING":
-        print(f"{YELLOW}⚠ {message}{NC}")
-    else:
-        print(f"{BLUE}ℹ {message}{NC}")
+    emit(STATUS_FORMATS.get(status, STATUS_FORMATS["INFO"]).format(message))
+
+def spawn_args(*cmd):
+    """Resolve the program to an absolute path for CPython's posix_spawn path"""
+    # subprocess only uses posix_spawn() when the executable has a directory
+    # component and close_fds is False. Our own descriptors are created
+    # non-inheritable (PEP 446), so the children do not pick them up anyway.
+    # Each program is looked up on $PATH only once per process.
+    program = cmd[0]
+    if program not in PROGRAM_PATHS:
+        import shutil
+        PROGRAM_PATHS[program] = shutil.which(program) or program
+    return [PROGRAM_PATHS[program], *cmd[1:]]
+
+def parse_active_states(units, output):
+    """Map each unit to whether `systemctl is-active` reported it active"""
+    states = output.splitlines()
+    return {unit: state.strip() == "active" for unit, state in zip(units, states)}
+
+def get_systemd_manager():
+    """Return the cached systemd D-Bus manager, or None if D-Bus is unavailable"""
+    global SYSTEM_BUS, SYSTEMD_MANAGER
+    if SYSTEMD_MANAGER is None:
+        try:
+            from pydbus import SystemBus
+            SYSTEM_BUS = SystemBus()
+            SYSTEMD_MANAGER = SYSTEM_BUS.get(".systemd1")
+        except Exception:  # No pydbus or no system bus, use systemctl instead
+            SYSTEMD_MANAGER = False
+    return SYSTEMD_MANAGER or None
+
+def get_dbus_active_states(units):
+    """Read each unit's ActiveState straight from systemd over D-Bus"""
+    manager = get_systemd_manager()
+    states = {}
+    for unit in units:
+        try:
+            unit_path = manager.GetUnit(unit)
+        except Exception as e:
+            # Only an unloaded unit means "not running"; anything else (access
+            # denied, timeout, bus gone) goes back to get_active_states so it
+            # can fall back to systemctl
+            if "org.freedesktop.systemd1.NoSuchUnit" not in str(e):
+                raise
+            states[unit] = False
+            continue
+        states[unit] = SYSTEM_BUS.get(".systemd1", unit_path).ActiveState == "active"
+    return states
 
-def test_systemd_service(service_name):
-    """Test if a systemd service is running"""
+def get_active_states(units):
+    """Check several systemd services over D-Bus or with a single systemctl call"""
+    if get_systemd_manager() is not None:
+        try:
+            return get_dbus_active_states(units)
+        except Exception:
+            pass
     try:
         result = subprocess.run(
-            ["systemctl", "is-active", service_name],
+            spawn_args("systemctl", "is-active", *units),
             capture_output=True,
-            text=True
+            text=True,
+            close_fds=False
         )
-        return result.stdout.strip() == "active"
+        states = parse_active_states(units, result.stdout)
     except Exception:
-        return False
+        states = {}
+    return {unit: states.get(unit, False) for unit in units}
+
+def get_orjson():
+    """Return the orjson module, or None if it is not installed"""
+    global ORJSON
+    if ORJSON is None:
+        try:
+            import orjson
+            ORJSON = orjson
+        except ImportError:  # Fall back to the stdlib json module
+            ORJSON = False
+    return ORJSON or None
 
-def test_http_service(name, port, endpoint="/info", timeout=5):
+def parse_body(raw, content_type):
+    """Decode a response body once, as JSON when the content type says so"""
+    if content_type.startswith('application/json'):
+        orjson = get_orjson()
+        if orjson is not None:
+            return orjson.loads(raw)
+        import json
+        return json.loads(raw)
+    return raw.decode('utf-8', 'replace')
+
+class ProbeConnectError(OSError):
+    """The connection to a service could not be opened (refused or timed out)"""
+
+def http_get(conn, endpoint, connect_timeout, read_timeout):
+    """Send a GET on a connection and return (status, content type, body)"""
+    if conn.sock is None:
+        conn.timeout = connect_timeout
+        try:
+            conn.connect()
+        except OSError as e:
+            raise ProbeConnectError(str(e) or type(e).__name__) from e
+    conn.sock.settimeout(read_timeout)
+    conn.request("GET", endpoint)
+    response = conn.getresponse()
+    body = response.read()
+    if response.will_close:
+        conn.close()
+    return response.status, response.getheader("content-type", ""), body
+
+def release_connection(port, conn):
+    """Keep a still-open connection for reuse, or close it if one is pooled"""
+    if conn.sock is not None:
+        with POOL_LOCK:
+            if port not in IDLE_CONNECTIONS:
+                IDLE_CONNECTIONS[port] = conn
+                return
+    conn.close()
+
+def http_probe(port, endpoint, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+    """GET an endpoint on localhost, reusing an idle keep-alive connection"""
+    import http.client
+    with POOL_LOCK:
+        conn = IDLE_CONNECTIONS.pop(port, None)
+    reused = conn is not None
+    if not reused:
+        conn = http.client.HTTPConnection("localhost", port)
+    try:
+        result = http_get(conn, endpoint, connect_timeout, read_timeout)
+    except (ConnectionResetError, BrokenPipeError):
+        conn.close()
+        if not reused:
+            raise
+        # The service dropped the idle connection, retry on a fresh one
+        return http_probe(port, endpoint, connect_timeout, read_timeout)
+    except BaseException:
+        conn.close()
+        raise
+    release_connection(port, conn)
+    return result
+
+def close_connections():
+    """Close all idle keep-alive connections"""
+    with POOL_LOCK:
+        for conn in IDLE_CONNECTIONS.values():
+            conn.close()
+        IDLE_CONNECTIONS.clear()
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Return the jittered delay before retrying after a failed attempt"""
+    import random
+    return min(cap, base * 2 ** attempt) + random.uniform(0, base)
+
+def retry_delay(attempt, error, is_retryable, attempts=PROBE_ATTEMPTS):
+    """Return the delay before retrying a failed attempt, or re-raise its error"""
+    # The http.client and aiohttp probes both retry through here, so they share
+    # the attempt count and backoff that PROBE_WORST_CASE is derived from
+    if attempt == attempts - 1 or not is_retryable(error):
+        raise error
+    return backoff_delay(attempt)
+
+def probe_with_backoff(port, endpoint, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
+    """GET a local endpoint, retrying failures to connect"""
+    # HTTP error statuses come back as results and read timeouts are raised
+    # straight away, so only the connect phase is ever repeated
+    for attempt in range(PROBE_ATTEMPTS):
+        try:
+            return http_probe(port, endpoint, connect_timeout, read_timeout)
+        except Exception as e:
+            time.sleep(retry_delay(attempt, e, lambda err: isinstance(err, ProbeConnectError)))
+
+def test_http_service(name, port, endpoint="/info", connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT):
     """Test HTTP service endpoint"""
+    import http.client
+    try:
+        status, content_type, body = probe_with_backoff(port, endpoint, connect_timeout, read_timeout)
+        if status == 200:
+            return True, parse_body(body, content_type)
+        return False, f"HTTP {status}"
+    except (OSError, http.client.HTTPException) as e:
+        return False, str(e) or type(e).__name__
+    except ValueError as e:
+        return False, f"Invalid JSON response: {e}"
+
+def _cached_http_probe(name, port, endpoint="/info"):
+    """Return the probe result for this run, probing only on the first call"""
+    if (port, endpoint) in HTTP_RESULTS:
+        return HTTP_RESULTS[(port, endpoint)]
+    started = CACHE_ROUND
+    result = test_http_service(name, port, endpoint)
+    if started == CACHE_ROUND:
+        HTTP_RESULTS[(port, endpoint)] = result
+    return result
+
+def _cached_is_active(unit):
+    """Return whether a systemd unit is active, checking it only once per run"""
+    if unit in SYSTEMD_RESULTS:
+        return SYSTEMD_RESULTS[unit]
+    started = CACHE_ROUND
+    states = get_active_states([unit])
+    if started == CACHE_ROUND:
+        SYSTEMD_RESULTS.update(states)
+    return states[unit]
+
+def check_internet():
+    """Return the HTTP status of the internet probe, retrying a failed connect once"""
+    import http.client
+    host, endpoint = INTERNET_PROBE
+    for attempt in range(2):
+        conn = http.client.HTTPSConnection(host)
+        try:
+            status, _, _ = http_get(conn, endpoint, 2.0, 3.0)
+            return status
+        except ProbeConnectError:
+            if attempt:
+                raise
+        finally:
+            conn.close()
+
+def _cached_internet_check():
+    """Return the internet probe status for this run, re-raising its error"""
+    if INTERNET_PROBE not in HTTP_RESULTS:
+        try:
+            HTTP_RESULTS[INTERNET_PROBE] = check_internet()
+        except Exception as e:
+            HTTP_RESULTS[INTERNET_PROBE] = e
+    result = HTTP_RESULTS[INTERNET_PROBE]
+    if isinstance(result, BaseException):
+        raise result
+    return result
+
+def clear_caches():
+    """Forget all probe results so the next run checks every service again"""
+    global CACHE_ROUND
+    CACHE_ROUND += 1
+    HTTP_RESULTS.clear()
+    SYSTEMD_RESULTS.clear()
+
+async def probe(name, port, endpoint, session=None):
+    """Probe an HTTP endpoint without blocking the event loop"""
+    import asyncio
+    if session is None:
+        return await asyncio.to_thread(test_http_service, name, port, endpoint)
+    import aiohttp
+    # Only connect-phase failures are retried; ConnectionTimeoutError needs
+    # aiohttp 3.10, older versions report it as a non-retried timeout
+    retryable = (aiohttp.ClientConnectorError,)
+    if hasattr(aiohttp, "ConnectionTimeoutError"):
+        retryable += (aiohttp.ConnectionTimeoutError,)
+    url = f"http://localhost:{port}{endpoint}"
+    try:
+        for attempt in range(PROBE_ATTEMPTS):
+            try:
+                async with session.get(url) as response:
+                    if response.status == 200:
+                        return True, parse_body(await response.read(), response.headers.get('content-type', ''))
+                    return False, f"HTTP {response.status}"
+            except Exception as e:
+                await asyncio.sleep(retry_delay(attempt, e, lambda err: isinstance(err, retryable)))
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return False, str(e) or type(e).__name__
+    except ValueError as e:
+        return False, f"Invalid JSON response: {e}"
+
+async def capture_output(*cmd):
+    """Run a command as an asyncio subprocess and return its stdout"""
+    import asyncio
+    process = await asyncio.create_subprocess_exec(
+        *spawn_args(*cmd),
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        close_fds=False
+    )
+    stdout, _ = await process.communicate()
+    return stdout.decode(errors="replace")
+
+async def systemd_states(units):
+    """Check systemd units without blocking the event loop"""
+    import asyncio
+    if get_systemd_manager() is not None:
+        return await asyncio.to_thread(get_active_states, units)
+    return parse_active_states(units, await capture_output("systemctl", "is-active", *units))
+
+def open_client_session():
+    """Return an aiohttp session with the probe timeouts, or None without aiohttp"""
     try:
-        url = f"http://localhost:{port}{endpoint}"
-        response = requests.get(url, timeout=timeout)
-        if response.status_code == 200:
-            return True, response.json() if response.headers.get('content-type', '').startswith('application/json') else response.text
-        return False, f"HTTP {response.status_code}"
-    except requests.exceptions.RequestException as e:
-        return False, str(e)
+        import aiohttp
+    except ImportError:  # Fall back to http.client in worker threads
+        return None
+    timeout = aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+    return aiohttp.ClientSession(timeout=timeout)
+
+async def run_all_probes(session=None):
+    """Run every HTTP and systemd probe concurrently"""
+    import asyncio
+    
+    async def gather_all(session=None):
+        return await asyncio.gather(
+            *(probe(*target, session=session) for target in HTTP_TARGETS),
+            systemd_states(SYSTEMD_UNITS),
+            asyncio.to_thread(check_internet),
+            return_exceptions=True
+        )
+
+    if session is None:
+        session = open_client_session()
+        if session is None:
+            results = await gather_all()
+        else:
+            async with session:
+                results = await gather_all(session)
+    else:
+        results = await gather_all(session)
+
+    http_results = results[:len(HTTP_TARGETS)]
+    unit_result = results[len(HTTP_TARGETS)]
+    internet_result = results[len(HTTP_TARGETS) + 1]
+
+    # Exceptions are left out so the tests retry them synchronously
+    for (_, port, endpoint), result in zip(HTTP_TARGETS, http_results):
+        if not isinstance(result, BaseException):
+            HTTP_RESULTS[(port, endpoint)] = result
+    if not isinstance(unit_result, BaseException):
+        SYSTEMD_RESULTS.update(unit_result)
+    # A failed internet probe is kept so the connectivity test reports it
+    # rather than waiting on the same timeouts again
+    HTTP_RESULTS[INTERNET_PROBE] = internet_result
 
 def test_ollama_service():
     """Test Ollama LLM service"""
     print_status("Testing Ollama LLM service...")
     
     # Check systemd service
-    if not test_systemd_service("ollama.service"):
+    if not _cached_is_active("ollama.service"):
         print_status("Ollama systemd service not running", "ERROR")
         return False
     
     # Check HTTP endpoint
-    success, info = test_http_service("Ollama", 11434, "/api/version")
+    success, info = _cached_http_probe("Ollama", 11434, "/api/version")
     if success:
         print_status(f"Ollama service responding - Version: {info.get('version', 'Unknown')}", "SUCCESS")
         return True
@@ -73,26 +498,29 @@ def test_ollama_service():
 
 def test_wyoming_services():
     """Test all Wyoming services"""
-    services = [
-        ("Wyoming Whisper", 10300),
-        ("Wyoming Piper", 10200),
-        ("Wyoming OpenWakeWord", 10400)
-    ]
-    
+    from concurrent.futures import ThreadPoolExecutor
     all_good = True
     
-    for name, port in services:
-        service_name = f"wyoming-{name.lower().split()[1]}.service"
+    # Probe the running services concurrently, so one hung service costs at
+    # most one probe's time and the others are still reported
+    with ThreadPoolExecutor(max_workers=len(WYOMING_SERVICES)) as pool:
+        probes = {
+            name: pool.submit(_cached_http_probe, name, port)
+            for name, port, unit in WYOMING_SERVICES
+            if _cached_is_active(unit)
+        }
+    
+    for name, port, unit in WYOMING_SERVICES:
         print_status(f"Testing {name}...")
         
         # Check systemd service
-        if not test_systemd_service(service_name):
+        if name not in probes:
             print_status(f"{name} systemd service not running", "ERROR")
             all_good = False
             continue
         
         # Check HTTP endpoint
-        success, info = test_http_service(name, port)
+        success, info = probes[name].result()
         if success:
             service_info = info.get('name', 'Unknown') if isinstance(info, dict) else info
             print_status(f"{name} responding - {service_info}", "SUCCESS")
@@ -107,12 +535,12 @@ def test_home_assistant():
     print_status("Testing Home Assistant...")
     
     # Check systemd service
-    if not test_systemd_service("home-assistant@homeassistant.service"):
+    if not _cached_is_active("home-assistant@homeassistant.service"):
         print_status("Home Assistant systemd service not running", "ERROR")
         return False
     
     # Check HTTP endpoint
-    success, info = test_http_service("Home Assistant", 8123, "/")
+    success, info = _cached_http_probe("Home Assistant", 8123, "/")
     if success:
         print_status("Home Assistant web interface responding", "SUCCESS")
         return True
@@ -120,34 +548,134 @@ def test_home_assistant():
         print_status(f"Home Assistant HTTP endpoint failed: {info}", "ERROR")
         return False
 
-def test_audio_devices():
-    """Test audio devices"""
+def output_contains(cmd, needle, timeout=2):
+    """Stream a command's output and stop it as soon as a line contains needle"""
+    process = subprocess.Popen(
+        spawn_args(*cmd),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        errors="replace",
+        close_fds=False
+    )
+    # Reading has no timeout of its own, so a watchdog kills a stalled
+    # command, which ends the read with EOF
+    timed_out = threading.Event()
+    
+    def kill_stalled():
+        timed_out.set()
+        process.kill()
+    
+    watchdog = threading.Timer(timeout, kill_stalled)
+    watchdog.start()
+    try:
+        found = any(needle in line.lower() for line in process.stdout)
+        if found:
+            process.terminate()
+    finally:
+        watchdog.cancel()
+        process.stdout.close()
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise
+    if timed_out.is_set() and not found:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    return found
+
+def check_audio_devices():
+    """Report the ReSpeaker playback and capture devices and return (playback, capture)"""
     print_status("Testing audio devices...")
     
+    # The ReSpeaker card provides both playback and capture, so a single
+    # read of the ALSA card list covers both checks
+    from pathlib import Path
+    cards_file = Path("/proc/asound/cards")
+    if cards_file.exists():
+        has_playback = has_capture = "seeedvoicecard" in cards_file.read_text().lower()
+    else:
+        # Non-ALSA /proc layout, ask alsa-utils instead
+        has_playback = output_contains(["aplay", "-l"], "seeedvoicecard")
+        has_capture = output_contains(["arecord", "-l"], "seeedvoicecard")
+    
+    # Check for ReSpeaker HAT
+    if has_playback:
+        print_status("ReSpeaker HAT detected", "SUCCESS")
+    else:
+        print_status("ReSpeaker HAT not detected", "WARNING")
+    
+    # Check for recording devices
+    if has_capture:
+        print_status("Microphone input available", "SUCCESS")
+    else:
+        print_status("Microphone input not detected", "WARNING")
+    
+    return has_playback, has_capture
+
+def test_audio_devices():
+    """Test audio devices"""
     try:
-        # Check for ReSpeaker HAT
-        result = subprocess.run(["aplay", "-l"], capture_output=True, text=True)
-        if "seeedvoicecard" in result.stdout.lower():
-            print_status("ReSpeaker HAT detected", "SUCCESS")
-        else:
-            print_status("ReSpeaker HAT not detected", "WARNING")
-        
-        # Check for recording devices
-        result = subprocess.run(["arecord", "-l"], capture_output=True, text=True)
-        if "seeedvoicecard" in result.stdout.lower():
-            print_status("Microphone input available", "SUCCESS")
-        else:
-            print_status("Microphone input not detected", "WARNING")
-        
+        check_audio_devices()
         return True
     except Exception as e:
         print_status(f"Audio device test failed: {e}", "ERROR")
         return False
 
-def test_voice_pipeline():
+def run_in_daemon_thread(func):
+    """Run func in a daemon thread and return an asyncio future for its result"""
+    # Unlike executor workers, a daemon thread that is given up on after a
+    # timeout holds up neither asyncio.run() nor interpreter exit
+    import asyncio
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    context = contextvars.copy_context()
+    
+    def settle(set_outcome, value):
+        if not future.done():
+            set_outcome(value)
+    
+    def worker():
+        try:
+            outcome = (future.set_result, context.run(func))
+        except Exception as e:
+            outcome = (future.set_exception, e)
+        try:
+            loop.call_soon_threadsafe(settle, *outcome)
+        except RuntimeError:  # The event loop is already closed
+            pass
+    
+    threading.Thread(target=worker, daemon=True).start()
+    return future
+
+async def run_component(name, test_func):
+    """Run a blocking component test in a worker thread with a time limit"""
+    import asyncio
+    # Each gathered task runs in its own context copy, which the worker
+    # thread inherits, so the buffer set here only collects this test's output
+    output = []
+    STATUS_BUFFER.set(output)
+    try:
+        result = await asyncio.wait_for(run_in_daemon_thread(test_func), timeout=COMPONENT_TIMEOUT)
+    except asyncio.TimeoutError:
+        print_status(f"{name} test timed out after {COMPONENT_TIMEOUT:g}s", "ERROR")
+        result = False
+    except Exception as e:
+        print_status(f"{name} test failed with exception: {e}", "ERROR")
+        result = False
+    return result, output
+
+async def test_voice_pipeline(fail_fast=False):
     """Test the complete voice pipeline"""
+    import asyncio
     print_status("Testing complete voice pipeline...")
     
+    # Fall back to one batched systemctl call if the prefetch missed any unit
+    # (with fail_fast each component checks its own units when it gets to them)
+    if not fail_fast and any(unit not in SYSTEMD_RESULTS for unit in SYSTEMD_UNITS):
+        SYSTEMD_RESULTS.update(await asyncio.to_thread(get_active_states, SYSTEMD_UNITS))
+    
     # Test each component
     components = [
         ("Ollama LLM", test_ollama_service),
@@ -156,58 +684,91 @@ def test_voice_pipeline():
         ("Audio Devices", test_audio_devices)
     ]
     
+    if fail_fast:
+        # One at a time, so the components after the first failure are never
+        # probed. Each still runs as its own task so its output buffer is not
+        # set in this context.
+        outcomes = []
+        for name, test_func in components:
+            outcomes.append(await asyncio.create_task(run_component(name, test_func)))
+            if not outcomes[-1][0]:
+                break
+    else:
+        # Run the components concurrently so one hung service cannot stall the rest
+        outcomes = await asyncio.gather(
+            *(run_component(name, test_func) for name, test_func in components),
+            return_exceptions=True
+        )
+    
     results = {}
     all_passed = True
     
-    for name, test_func in components:
-        print(f"\n{BLUE}=== Testing {name} ==={NC}")
-        try:
-            result = test_func()
-            results[name] = result
-            if not result:
-                all_passed = False
-        except Exception as e:
-            print_status(f"{name} test failed with exception: {e}", "ERROR")
-            results[name] = False
+    for (name, _), outcome in zip(components, outcomes):
+        emit(f"\n{BLUE}=== Testing {name} ==={NC}")
+        if isinstance(outcome, BaseException):
+            print_status(f"{name} test failed with exception: {outcome}", "ERROR")
+            result = False
+        else:
+            result, output = outcome
+            for line in output:
+                emit(line)
+        results[name] = result
+        if not result:
             all_passed = False
     
     return all_passed, results
 
+def read_meminfo():
+    """Return the kB values from /proc/meminfo keyed by field name"""
+    meminfo = {}
+    with open("/proc/meminfo") as f:
+        for line in f.read().splitlines():
+            key, _, value = line.partition(":")
+            fields = value.split()
+            if fields:
+                meminfo[key] = int(fields[0])
+    return meminfo
+
+def read_cpu_temperature():
+    """Return the CPU temperature in °C, or None without a thermal zone"""
+    # The sysfs file is opened once and re-read with pread() on later calls
+    global THERMAL_FD
+    if THERMAL_FD is None:
+        try:
+            THERMAL_FD = os.open(THERMAL_ZONE, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+    return int(os.pread(THERMAL_FD, 16, 0)) / 1000
+
 def test_system_resources():
     """Test system resource usage"""
     print_status("Testing system resources...")
     
     try:
         # Check disk space
-        result = subprocess.run(["df", "/"], capture_output=True, text=True)
-        lines = result.stdout.strip().split('\n')
-        if len(lines) > 1:
-            parts = lines[1].split()
-            if len(parts) >= 5:
-                usage = int(parts[4].replace('%', ''))
-                if usage < 90:
-                    print_status(f"Disk usage: {usage}%", "SUCCESS")
-                else:
-                    print_status(f"Disk usage critical: {usage}%", "WARNING")
+        st = os.statvfs("/")
+        if st.f_blocks:
+            used = st.f_blocks - st.f_bfree
+            usage = math.ceil(100 * used / (used + st.f_bavail))  # Rounded up like df
+            if usage < 90:
+                print_status(f"Disk usage: {usage}%", "SUCCESS")
+            else:
+                print_status(f"Disk usage critical: {usage}%", "WARNING")
         
         # Check memory usage
-        result = subprocess.run(["free", "-m"], capture_output=True, text=True)
-        lines = result.stdout.strip().split('\n')
-        if len(lines) > 1:
-            parts = lines[1].split()
-            if len(parts) >= 3:
-                total = int(parts[1])
-                used = int(parts[2])
-                usage = (used / total) * 100
-                if usage < 90:
-                    print_status(f"Memory usage: {usage:.1f}%", "SUCCESS")
-                else:
-                    print_status(f"Memory usage critical: {usage:.1f}%", "WARNING")
+        meminfo = read_meminfo()
+        if "MemTotal" in meminfo and "MemAvailable" in meminfo:
+            total = meminfo["MemTotal"]
+            used = total - meminfo["MemAvailable"]
+            usage = (used / total) * 100
+            if usage < 90:
+                print_status(f"Memory usage: {usage:.1f}%", "SUCCESS")
+            else:
+                print_status(f"Memory usage critical: {usage:.1f}%", "WARNING")
         
         # Check CPU temperature (Raspberry Pi)
-        temp_file = Path("/sys/class/thermal/thermal_zone0/temp")
-        if temp_file.exists():
-            temp = int(temp_file.read_text().strip()) / 1000
+        temp = read_cpu_temperature()
+        if temp is not None:
             if temp < 80:
                 print_status(f"CPU temperature: {temp}°C", "SUCCESS")
             else:
@@ -224,35 +785,53 @@ def test_network_connectivity():
     
     try:
         # Test internet connectivity
-        response = requests.get("https://httpbin.org/get", timeout=5)
-        if response.status_code == 200:
+        status = _cached_internet_check()
+        if status == 200:
             print_status("Internet connectivity: OK", "SUCCESS")
         else:
             print_status("Internet connectivity: Limited", "WARNING")
         
-        # Test local network
-        response = requests.get("http://localhost:8123", timeout=5)
-        if response.status_code == 200:
+        # Test local network, reusing the Home Assistant probe result
+        success, info = _cached_http_probe("Home Assistant", 8123, "/")
+        if success:
             print_status("Local network: OK", "SUCCESS")
         else:
-            print_status("Local network: Issues detected", "WARNING")
+            print_status(f"Local network: Issues detected ({info})", "WARNING")
         
         return True
     except Exception as e:
         print_status(f"Network test failed: {e}", "ERROR")
         return False
 
-def generate_report(results):
-    """Generate a test report"""
-    print(f"\n{BLUE}=== Voice Assistant Test Report ==={NC}")
+def write_json(record):
+    """Write a record to stdout as one line of JSON"""
+    orjson = get_orjson()
+    if orjson is not None:
+        data = orjson.dumps(record)
+    else:
+        import json
+        data = json.dumps(record).encode()
+    sys.stdout.buffer.write(data + b"\n")
+    sys.stdout.buffer.flush()
+
+def generate_report(passed_tests, failed_tests, results, as_json=False):
+    """Generate a test report, optionally as JSON on stdout"""
+    total_tests = passed_tests + failed_tests
+    
+    if as_json:
+        write_json({
+            "total": total_tests,
+            "passed": passed_tests,
+            "failed": failed_tests,
+            "services": {name.strip(): bool(result) for name, result in results.items()},
+        })
+        return failed_tests == 0
     
-    total_tests = len(results)
-    passed_tests = sum(1 for result in results.values() if result)
-    failed_tests = total_tests - passed_tests
+    emit(f"\n{BLUE}=== Voice Assistant Test Report ==={NC}")
     
-    print(f"Total Tests: {total_tests}")
-    print(f"Passed: {GREEN}{passed_tests}{NC}")
-    print(f"Failed: {RED}{failed_tests}{NC}")
+    emit(f"Total Tests: {total_tests}")
+    emit(f"Passed: {GREEN}{passed_tests}{NC}")
+    emit(f"Failed: {RED}{failed_tests}{NC}")
     
     if failed_tests == 0:
         print_status("All tests passed! Voice assistant is ready to use.", "SUCCESS")
@@ -261,10 +840,13 @@ def generate_report(results):
         print_status(f"{failed_tests} test(s) failed. Please check the errors above.", "ERROR")
         return False
 
-def main():
-    """Main test function"""
-    print(f"{BLUE}Voice Assistant Pipeline Test{NC}")
-    print("=" * 40)
+async def run_tests(fail_fast=False, session=None):
+    """Probe all services, then run the tests and count passes and failures"""
+    # Probe every service concurrently so the tests below only read results.
+    # With fail_fast the tests probe on demand instead, so nothing past the
+    # first failure is probed at all.
+    if not fail_fast:
+        await run_all_probes(session)
     
     # Run all tests
     tests = [
@@ -274,24 +856,156 @@ def main():
     ]
     
     results = {}
+    passed = failed = 0
+    
+    def record(name, result):
+        nonlocal passed, failed
+        results[name] = result
+        passed += bool(result)
+        failed += not result
     
     for test_name, test_func in tests:
-        print(f"\n{BLUE}=== {test_name} ==={NC}")
+        emit(f"\n{BLUE}=== {test_name} ==={NC}")
         try:
             if test_name == "Voice Pipeline":
-                success, component_results = test_func()
-                results[test_name] = success
+                success, component_results = await test_func(fail_fast)
+                record(test_name, success)
                 # Add individual component results
                 for comp_name, comp_result in component_results.items():
-                    results[f"  {comp_name}"] = comp_result
+                    record(f"  {comp_name}", comp_result)
             else:
-                results[test_name] = test_func()
+                record(test_name, test_func())
         except Exception as e:
             print_status(f"{test_name} test failed with exception: {e}", "ERROR")
-            results[test_name] = False
+            record(test_name, False)
+        
+        if fail_fast and failed:
+            print_status("Stopping at the first failure (--fail-fast)", "WARNING")
+            break
+    
+    return passed, failed, results
+
+def start_sound_monitor(callback):
+    """Call callback whenever a sound device is added or removed, if pyudev is available"""
+    try:
+        import pyudev
+    except ImportError:  # Only the interval timer wakes the daemon
+        return None
+    monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+    monitor.filter_by(subsystem="sound")
+    observer = pyudev.MonitorObserver(monitor, callback=lambda device: callback())
+    observer.start()
+    return observer
+
+async def run_daemon(interval, fail_fast=False, as_json=False):
+    """Repeat the tests every interval seconds and re-check audio on sound card changes"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    sound_changed = asyncio.Event()
+    observer = start_sound_monitor(lambda: loop.call_soon_threadsafe(sound_changed.set))
+    
+    # The aiohttp session, D-Bus proxies and keep-alive connections are
+    # shared by every round instead of being set up again each time
+    session = open_client_session()
+    next_round = loop.time()
+    try:
+        while True:
+            if loop.time() >= next_round:
+                emit(f"\n{BLUE}=== Test round at {time.strftime('%Y-%m-%d %H:%M:%S')} ==={NC}")
+                clear_caches()
+                passed, failed, results = await run_tests(fail_fast, session)
+                generate_report(passed, failed, results, as_json)
+                next_round = loop.time() + interval
+            else:
+                # A card usually raises a burst of udev events, let it settle
+                await asyncio.sleep(0.5)
+                sound_changed.clear()
+                emit(f"\n{BLUE}=== Sound device change ==={NC}")
+                # Only the audio devices are re-checked, so this is reported
+                # as a sound event line rather than as a (partial) full report
+                event = {"trigger": "sound"}
+                try:
+                    event["playback"], event["capture"] = await asyncio.to_thread(check_audio_devices)
+                except Exception as e:
+                    print_status(f"Audio device test failed: {e}", "ERROR")
+                    event["error"] = str(e) or type(e).__name__
+                if as_json:
+                    write_json(event)
+            flush_output()
+            
+            try:
+                await asyncio.wait_for(sound_changed.wait(), timeout=max(0, next_round - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        if observer is not None:
+            observer.stop()
+        if session is not None:
+            await session.close()
+
+def positive_float(value):
+    """argparse type for a number of seconds greater than zero"""
+    try:
+        seconds = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid number: {value!r}")
+    if not seconds > 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0: {value!r}")
+    return seconds
+
+def main():
+    """Main test function"""
+    global OUTPUT, INTERACTIVE
+    parser = argparse.ArgumentParser(description="Test all components of the voice assistant system")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop after the first failing test or pipeline component, "
+                             "probing services one at a time instead of all up front")
+    parser.add_argument("--json", action="store_true",
+                        help="print the report as JSON on stdout (other output goes to stderr)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and repeat the tests every --interval seconds")
+    parser.add_argument("--interval", type=positive_float, default=None,
+                        help="seconds between test rounds in daemon mode (default: 300); "
+                             "with --json, a sound card change adds a line with \"trigger\": \"sound\" "
+                             "and the playback/capture detection flags")
+    args = parser.parse_args()
+    if args.interval is None:
+        args.interval = 300
+    elif not args.daemon:
+        parser.error("--interval requires --daemon")
+    
+    if args.json:
+        OUTPUT = sys.stderr
+        INTERACTIVE = OUTPUT.isatty()
+    
+    emit(f"{BLUE}Voice Assistant Pipeline Test{NC}")
+    emit("=" * 40)
+    
+    spawn_method = "posix_spawn" if getattr(subprocess, "_USE_POSIX_SPAWN", False) else "fork/exec"
+    print_status(f"Subprocesses launched via {spawn_method}")
+    
+    clear_caches()
     
-    # Generate final report
-    success = generate_report(results)
+    import asyncio
+    if args.daemon:
+        try:
+            asyncio.run(run_daemon(args.interval, args.fail_fast, args.json))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            close_connections()
+            flush_output()
+        sys.exit(0)
+    
+    try:
+        passed, failed, results = asyncio.run(run_tests(args.fail_fast))
+        
+        # Generate final report
+        success = generate_report(passed, failed, results, args.json)
+    finally:
+        # Release pooled sockets and write out any buffered output
+        close_connections()
+        flush_output()
     
     # Exit with appropriate code
     sys.exit(0 if success else 1)